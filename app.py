@@ -1,30 +1,51 @@
 import asyncio
 import logging
+import os
+import numpy as np
 import streamlit as st
-import threading
 import uuid
 import time
-from queue import Queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from av.audio.fifo import AudioFifo
+from av.audio.resampler import AudioResampler
+from av.video.reformatter import VideoReformatter
 from dotenv import load_dotenv
 
 # Import backend logic and UI
 from live import GeminiLive
 from ui import draw_interface
 
-# Configure logging
-logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
-logging.getLogger('asyncio').setLevel(logging.CRITICAL)
+# Must be the first Streamlit call of the script run
+st.set_page_config(
+    page_title="Gemini 2.0 Live Assistant",
+    page_icon="🤖",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
 
-# Load environment variables (for local development)
-load_dotenv()
+@st.cache_resource(show_spinner=False)
+def bootstrap():
+    """One-time process setup, skipped on every rerun after the first"""
+    # Configure logging
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+    logging.getLogger('asyncio').setLevel(logging.CRITICAL)
 
-# Thread-safe queue for async communication
-transcript_queue = Queue()
+    # Load environment variables (for local development)
+    load_dotenv()
+    return True
+
+bootstrap()
+logger = logging.getLogger(__name__)
+
+# Streamlit Cloud mounts the app under /mount/src; avoids touching st.secrets
+IS_STREAMLIT_CLOUD = bool(os.environ.get("STREAMLIT_SHARING_MODE")) or os.path.isdir("/mount/src")
 
 def initialize_session_state():
     """Initialize all session state variables"""
     if 'transcript' not in st.session_state:
-        st.session_state.transcript = []
+        # Bounded: old entries are evicted on append
+        st.session_state.transcript = deque(maxlen=50)
 
     if 'session_active' not in st.session_state:
         st.session_state.session_active = False
@@ -32,8 +53,30 @@ def initialize_session_state():
     if 'webrtc_component_key' not in st.session_state:
         st.session_state.webrtc_component_key = f"gemini-live-{uuid.uuid4().hex[:8]}"
 
-    if 'last_analysis_time' not in st.session_state:
-        st.session_state.last_analysis_time = 0
+    if 'transcript_queue' not in st.session_state:
+        # SPSC buffer: deque append/popleft are atomic, no lock needed
+        st.session_state.transcript_queue = deque(maxlen=1024)
+
+    if 'frame_ctx' not in st.session_state:
+        # Read by the WebRTC frame threads, which can't use session_state
+        st.session_state.frame_ctx = {
+            'gemini': None,
+            'count': 0,
+            # Reused so the scaler context isn't rebuilt for every frame
+            'reformatter': VideoReformatter(),
+            'thumbnailer': VideoReformatter(),
+            'last_thumb': None,
+            'last_sent': 0,
+            # Gemini takes 16 kHz mono 16-bit PCM; WebRTC decodes to 48 kHz
+            'resampler': AudioResampler(format='s16', layout='mono', rate=16000),
+            'audio_fifo': AudioFifo(),
+            'silent_chunks': 0,
+            'executor': ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix='gemini-analysis'
+            ),
+            'analysis': None
+        }
 
     if 'gemini_live' not in st.session_state:
         try:
@@ -52,23 +95,17 @@ def initialize_session_state():
                 st.markdown("### 🔑 **Setup Instructions:**")
                 
                 # Check if running locally or on cloud
-                try:
-                    # Try to detect if we're on Streamlit Cloud
-                    if hasattr(st, 'secrets') and st.secrets:
-                        # Running on Streamlit Cloud
-                        st.info("☁️ **You're on Streamlit Cloud** - Add your API key to app secrets:")
-                        st.code("""
+                if IS_STREAMLIT_CLOUD:
+                    # Running on Streamlit Cloud
+                    st.info("☁️ **You're on Streamlit Cloud** - Add your API key to app secrets:")
+                    st.code("""
     Go to: Manage app → Settings → Secrets
     Add: GEMINI_API_KEY = "your_actual_api_key_here"
-                        """)
-                    else:
-                        # Running locally
-                        st.info("📍 **Local Development** - Set your API key in .env file:")
-                        st.code("GEMINI_API_KEY=your_actual_api_key_here")
-                except:
-                    # Show both options if we can't detect
-                    st.info("📍 **Local Development:** Set GEMINI_API_KEY in your .env file")
-                    st.info("☁️ **Streamlit Cloud:** Add GEMINI_API_KEY to app secrets")
+                    """)
+                else:
+                    # Running locally
+                    st.info("📍 **Local Development** - Set your API key in .env file:")
+                    st.code("GEMINI_API_KEY=your_actual_api_key_here")
                 
                 st.info("🔗 **Get your API key:** https://makersuite.google.com/app/apikey")
                 st.warning("⚠️ **Important:** Never commit your API key to Git!")
@@ -88,18 +125,67 @@ def initialize_session_state():
 # Initialize session state first
 initialize_session_state()
 
+# Per-session state shared with background threads
+transcript_queue = st.session_state.transcript_queue
+frame_ctx = st.session_state.frame_ctx
+
+# Frame strides at the 15 fps ideal frame rate requested in ui.py:
+# send ~1 frame/second, analyze every ~5 seconds (a multiple of the send stride)
+SEND_EVERY_N_FRAMES = 15
+ANALYSIS_EVERY_N_FRAMES = 75
+
+# Frames are downscaled to this size before being handed to Gemini
+SEND_FRAME_WIDTH = 320
+SEND_FRAME_HEIGHT = 240
+
+# A frame whose 32x24 grayscale thumbnail differs from the last sent one by
+# less than this mean (0-255 scale) is a static scene; resend one anyway
+# every 3 seconds
+STATIC_SCENE_THRESHOLD = 2.0
+STATIC_RESEND_EVERY_N_FRAMES = 45
+
+# 100 ms of 16 kHz audio per send instead of one call per 20 ms frame
+AUDIO_CHUNK_SAMPLES = 1600
+
+# Audio chunks below this RMS level (16-bit PCM scale) count as silence
+SILENCE_RMS_THRESHOLD = 200
+
+# Keep sending 400 ms of silence after speech so word tails aren't clipped
+# and the model still hears the pause that ends a turn
+SILENCE_HANGOVER_CHUNKS = 4
+
 # --- Callback Functions ---
 
+def make_transcript_entry(event_type, content):
+    """Build a transcript entry; safe to call from any thread."""
+    return {
+        'type': event_type,
+        'content': content,
+        'timestamp': time.time()  # Format only when displayed
+    }
+
+def add_transcript_entry(event_type, content):
+    """Append a transcript entry (script thread only)."""
+    st.session_state.transcript.append(make_transcript_entry(event_type, content))
+
 def start_session_callback():
     """Start the Gemini session."""
     try:
         success = st.session_state.gemini_live.start_session()
         if success:
             st.session_state.session_active = True
-            transcript_queue.put(('system', "🚀 Gemini session started successfully!"))
+            # Fresh video state so the session's first frame is always sent
+            frame_ctx['count'] = 0
+            frame_ctx['last_thumb'] = None
+            frame_ctx['last_sent'] = 0
+            # Don't lead the new session with audio left from the last one
+            frame_ctx['audio_fifo'] = AudioFifo()
+            frame_ctx['silent_chunks'] = 0
+            frame_ctx['gemini'] = st.session_state.gemini_live
+            add_transcript_entry('system', "🚀 Gemini session started successfully!")
         else:
             st.session_state.session_active = False
-            transcript_queue.put(('error', "Failed to start session"))
+            add_transcript_entry('error', "Failed to start session")
         
     except Exception as e:
         st.error(f"Error starting session: {e}")
@@ -107,92 +193,118 @@ def start_session_callback():
 
 def stop_session_callback():
     """Stop the Gemini session."""
+    frame_ctx['gemini'] = None
     try:
         st.session_state.gemini_live.stop_session()
         st.session_state.session_active = False
-        transcript_queue.put(('system', "🛑 Session stopped successfully"))
+        add_transcript_entry('system', "🛑 Session stopped successfully")
         
     except Exception as e:
         st.error(f"Error stopping session: {e}")
-        transcript_queue.put(('error', f"Stop error: {str(e)}"))
+        add_transcript_entry('error', f"Stop error: {str(e)}")
+
+def analyze_frame(gemini_live):
+    """Describe the current frame and queue the result (runs on the executor)."""
+    try:
+        analysis = gemini_live.get_frame_analysis(
+            "Briefly describe what you see in this frame."
+        )
+        if not analysis:
+            return
+        transcript_queue.append(
+            make_transcript_entry('ai', f"👁️ I see: {analysis}")
+        )
+    except Exception as e:
+        logger.warning("Analysis error: %s", e)
 
 def video_frame_callback(frame):
     """Process video frames from WebRTC."""
-    # Safe session state access
+    gemini_live = frame_ctx['gemini']
+    if gemini_live is None:
+        return frame
+    
     try:
-        session_active = getattr(st.session_state, 'session_active', False)
-        gemini_live = getattr(st.session_state, 'gemini_live', None)
+        count = frame_ctx['count']
+        frame_ctx['count'] = count + 1
         
-        if session_active and gemini_live:
-            try:
-                gemini_live.send_video_frame(frame)
-                
-                # Auto-analyze frame every 5 seconds
-                current_time = time.time()
-                last_analysis_time = getattr(st.session_state, 'last_analysis_time', 0)
-                
-                if current_time - last_analysis_time > 5:
-                    def analyze_frame():
-                        try:
-                            analysis = gemini_live.get_frame_analysis(
-                                "Briefly describe what you see in this frame."
-                            )
-                            transcript_queue.put(('ai', f"👁️ I see: {analysis}"))
-                        except Exception as e:
-                            print(f"Analysis error: {e}")
-                    
-                    # Run analysis in background
-                    thread = threading.Thread(target=analyze_frame)
-                    thread.daemon = True
-                    thread.start()
-                    
-                    st.session_state.last_analysis_time = current_time
-                    
-            except Exception as e:
-                print(f"⚠️ Error processing video frame: {e}")
+        # Gemini only needs about one frame per second
+        if count % SEND_EVERY_N_FRAMES:
+            return frame
+        
+        # Skip frames of an unchanged scene
+        thumb = frame_ctx['thumbnailer'].reformat(
+            frame, width=32, height=24, format='gray'
+        ).to_ndarray().astype(np.int16)
+        last_thumb = frame_ctx['last_thumb']
+        if (last_thumb is not None
+                and count - frame_ctx['last_sent'] < STATIC_RESEND_EVERY_N_FRAMES
+                and np.mean(np.abs(thumb - last_thumb)) < STATIC_SCENE_THRESHOLD):
+            return frame
+        frame_ctx['last_thumb'] = thumb
+        frame_ctx['last_sent'] = count
+        
+        # The preview keeps the full frame; only Gemini gets the small copy
+        gemini_live.send_video_frame(
+            frame_ctx['reformatter'].reformat(
+                frame, width=SEND_FRAME_WIDTH, height=SEND_FRAME_HEIGHT
+            )
+        )
+        
+        # Auto-analyze one frame every ~5 seconds
+        if count % ANALYSIS_EVERY_N_FRAMES == 0:
+            # Skip this slot if the previous analysis is still running
+            pending = frame_ctx['analysis']
+            if pending is None or pending.done():
+                frame_ctx['analysis'] = frame_ctx['executor'].submit(
+                    analyze_frame, gemini_live
+                )
+            
     except Exception as e:
-        print(f"⚠️ Error in video callback: {e}")
+        logger.warning("Error processing video frame: %s", e)
     
     return frame
 
 def audio_frame_callback(frame):
     """Process audio frames from WebRTC."""
-    # Safe session state access
+    gemini_live = frame_ctx['gemini']
+    if gemini_live is None:
+        return frame
+    
     try:
-        session_active = getattr(st.session_state, 'session_active', False)
-        gemini_live = getattr(st.session_state, 'gemini_live', None)
+        fifo = frame_ctx['audio_fifo']
+        for pcm in frame_ctx['resampler'].resample(frame):
+            pcm.pts = None  # Dropped frames would otherwise fail the pts check
+            fifo.write(pcm)
         
-        if session_active and gemini_live:
-            try:
-                gemini_live.send_audio_frame(frame)
-            except Exception as e:
-                print(f"⚠️ Error processing audio frame: {e}")
+        while fifo.samples >= AUDIO_CHUNK_SAMPLES:
+            chunk = fifo.read(AUDIO_CHUNK_SAMPLES)
+            
+            # Don't upload sustained silence; compare mean square to avoid a sqrt per chunk
+            # Packed mono s16: read the plane buffer directly, no ndarray copy
+            samples = np.frombuffer(chunk.planes[0], dtype=np.int16, count=chunk.samples)
+            if np.mean(np.square(samples, dtype=np.float32)) < SILENCE_RMS_THRESHOLD ** 2:
+                frame_ctx['silent_chunks'] += 1
+                if frame_ctx['silent_chunks'] > SILENCE_HANGOVER_CHUNKS:
+                    continue
+            else:
+                frame_ctx['silent_chunks'] = 0
+            
+            gemini_live.send_audio_frame(chunk)
     except Exception as e:
-        print(f"⚠️ Error in audio callback: {e}")
+        logger.warning("Error processing audio frame: %s", e)
     
     return frame
 
 # --- Process Queue Updates ---
-updates_processed = 0
-max_updates_per_cycle = 5
+def drain_transcript_queue():
+    """Move queued entries into the transcript and return it."""
+    transcript = st.session_state.transcript
 
-while not transcript_queue.empty() and updates_processed < max_updates_per_cycle:
-    try:
-        event_type, data = transcript_queue.get_nowait()
-        timestamp = time.strftime("%H:%M:%S")
-        
-        st.session_state.transcript.append({
-            'type': event_type,
-            'content': data,
-            'timestamp': timestamp
-        })
-        updates_processed += 1
-    except:
-        break
-
-# Limit transcript size
-if len(st.session_state.transcript) > 50:
-    st.session_state.transcript = st.session_state.transcript[-50:]
+    # Take only what is queued now; entries appended meanwhile wait a cycle
+    for _ in range(len(transcript_queue)):
+        transcript.append(transcript_queue.popleft())
+
+    return transcript
 
 # --- Main UI ---
 try:
@@ -202,7 +314,7 @@ try:
         video_frame_callback=video_frame_callback,
         audio_frame_callback=audio_frame_callback,
         is_running=st.session_state.session_active,
-        transcript=st.session_state.transcript
+        poll_transcript=drain_transcript_queue
     )
 except Exception as e:
     st.error(f"❌ **UI Error:** {str(e)}")
@@ -1,5 +1,4 @@
 import streamlit as st
-import asyncio
 import threading
 import queue
 import logging
@@ -10,13 +9,6 @@ import io
 # Suppress Streamlit warnings
 logging.getLogger('streamlit').setLevel(logging.ERROR)
 
-# Configure Streamlit page
-st.set_page_config(
-    page_title="Media Processor",
-    page_icon="🎬",
-    layout="wide"
-)
-
 class MediaProcessor:
     def __init__(self):
         self.processing_queue = queue.Queue()
@@ -36,17 +28,19 @@ class MediaProcessor:
     def _background_worker(self):
         """Background worker that processes media without Streamlit calls"""
         while self.is_running:
+            # Block until a task arrives; the timeout lets is_running be rechecked
             try:
-                if not self.processing_queue.empty():
-                    task = self.processing_queue.get(timeout=1)
-                    result = self._process_media_item(task)
-                    self.result_queue.put(result)
-                else:
-                    time.sleep(0.1)
+                task = self.processing_queue.get(timeout=1)
             except queue.Empty:
                 continue
+            
+            try:
+                result = self._process_media_item(task)
+                self.result_queue.put(result)
             except Exception as e:
                 self.result_queue.put({"error": str(e)})
+            finally:
+                self.processing_queue.task_done()
     
     def _process_media_item(self, task_data):
         """Process media item without any Streamlit calls"""
@@ -86,13 +80,10 @@ class MediaProcessor:
     
     def get_results(self):
         """Get all available results"""
-        results = []
-        while not self.result_queue.empty():
-            try:
-                result = self.result_queue.get_nowait()
-                results.append(result)
-            except queue.Empty:
-                break
+        # Drain the underlying deque under one lock acquisition
+        with self.result_queue.mutex:
+            results = list(self.result_queue.queue)
+            self.result_queue.queue.clear()
         return results
 
 # Initialize session state
@@ -107,18 +98,17 @@ def initialize_session_state():
         st.session_state.media_processor.start_background_processor()
         st.session_state.processor_started = True
 
-# Async processing function (runs in main thread)
-async def async_process_multiple_files(files):
-    """Async processing that doesn't interfere with Streamlit context"""
+# Queuing is just add_task calls, so it runs inline on the script thread
+def process_multiple_files(media_processor, files):
+    """Queue uploads for the background processor without Streamlit calls"""
     results = []
     
     for file in files:
-        # Process each file asynchronously
-        await asyncio.sleep(0.1)  # Simulate async work
-        
         # Add to background processor queue
-        st.session_state.media_processor.add_task(
-            file_data=file.read() if file else None,
+        media_processor.add_task(
+            # getvalue() hands back the upload's bytes without copying them,
+            # whatever the read position
+            file_data=file.getvalue() if file else None,
             file_type=file.type if hasattr(file, 'type') else 'unknown'
         )
         
@@ -129,7 +119,49 @@ async def async_process_multiple_files(files):
     
     return results
 
+# Kept live while files are pending without rerunning the whole page
+@st.fragment(run_every=2)
+def _draw_queue_status():
+    queue_size = st.session_state.media_processor.processing_queue.qsize()
+    st.metric("Queue Size", queue_size)
+
+# Results panel refreshes itself, leaving the script thread free for input
+@st.fragment(run_every=2)
+def _draw_results():
+    st.header("Processing Results")
+    
+    # Check for new results
+    new_results = st.session_state.media_processor.get_results()
+    if new_results:
+        st.session_state.processing_results.extend(new_results)
+    
+    # Display results
+    if st.session_state.processing_results:
+        for i, result in enumerate(reversed(st.session_state.processing_results[-10:])):
+            with st.expander(f"Result {len(st.session_state.processing_results) - i}"):
+                if result.get('status') == 'success':
+                    st.success(result.get('message', 'Processing completed'))
+                    st.json({
+                        'type': result.get('type'),
+                        'size': result.get('size'),
+                        'processed_at': time.ctime(result.get('processed_at', 0))
+                    })
+                else:
+                    st.error(f"Error: {result.get('error', 'Unknown error')}")
+    else:
+        st.info("No results yet. Upload and process files to see results here.")
+    
+    # Clicking reruns just this fragment
+    st.button("🔄 Refresh Results")
+
 def main():
+    # Configure Streamlit page (here, not at import, so app.py owns its page)
+    st.set_page_config(
+        page_title="Media Processor",
+        page_icon="🎬",
+        layout="wide"
+    )
+    
     # Initialize everything
     initialize_session_state()
     
@@ -141,8 +173,7 @@ def main():
         st.header("Controls")
         
         # Queue status
-        queue_size = st.session_state.media_processor.processing_queue.qsize()
-        st.metric("Queue Size", queue_size)
+        _draw_queue_status()
         
         # Clear results
         if st.button("Clear Results"):
@@ -166,56 +197,18 @@ def main():
         if st.button("Process Files", disabled=not uploaded_files):
             if uploaded_files:
                 with st.spinner("Adding files to processing queue..."):
-                    # Use asyncio in main thread - this is safe
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
+                    queued_results = process_multiple_files(
+                        st.session_state.media_processor,
+                        uploaded_files
+                    )
+                    st.success(f"Added {len(queued_results)} files to processing queue!")
                     
-                    try:
-                        queued_results = loop.run_until_complete(
-                            async_process_multiple_files(uploaded_files)
-                        )
-                        st.success(f"Added {len(queued_results)} files to processing queue!")
-                        
-                        # Display queued files
-                        for result in queued_results:
-                            st.info(f"Queued: {result['filename']}")
-                            
-                    finally:
-                        loop.close()
+                    # Display queued files
+                    for result in queued_results:
+                        st.info(f"Queued: {result['filename']}")
     
     with col2:
-        st.header("Processing Results")
-        
-        # Check for new results
-        new_results = st.session_state.media_processor.get_results()
-        if new_results:
-            st.session_state.processing_results.extend(new_results)
-            st.rerun()
-        
-        # Display results
-        if st.session_state.processing_results:
-            for i, result in enumerate(reversed(st.session_state.processing_results[-10:])):
-                with st.expander(f"Result {len(st.session_state.processing_results) - i}"):
-                    if result.get('status') == 'success':
-                        st.success(result.get('message', 'Processing completed'))
-                        st.json({
-                            'type': result.get('type'),
-                            'size': result.get('size'),
-                            'processed_at': time.ctime(result.get('processed_at', 0))
-                        })
-                    else:
-                        st.error(f"Error: {result.get('error', 'Unknown error')}")
-        else:
-            st.info("No results yet. Upload and process files to see results here.")
-        
-        # Auto-refresh button
-        if st.button("🔄 Refresh Results"):
-            st.rerun()
-    
-    # Auto-refresh every 2 seconds if there are items in queue
-    if queue_size > 0:
-        time.sleep(2)
-        st.rerun()
+        _draw_results()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,70 +1,139 @@
 import streamlit as st
-import uuid
 from streamlit_webrtc import webrtc_streamer, WebRtcMode
 
+# ✅ Universal WebRTC configuration for ALL devices (built once, not per rerun)
+_RTC_CONFIG = {
+    # One STUN server is enough to learn the public address
+    "iceServers": [
+        {"urls": ["stun:stun.l.google.com:19302"]},
+    ],
+    # Pre-gather a candidate so Start doesn't wait on the first gather
+    "iceCandidatePoolSize": 1
+}
+
+_MEDIA_CONSTRAINTS = {
+    "video": {
+        # Gemini only gets 320x240 at ~1 fps; let the browser downscale at source
+        "width": {"ideal": 320, "max": 640},
+        "height": {"ideal": 240, "max": 480},
+        "frameRate": {"ideal": 15, "max": 15},
+        "facingMode": "user"  # Front camera for mobile
+    },
+    "audio": {
+        "echoCancellation": True,
+        "noiseSuppression": True,
+        "autoGainControl": True,
+        "sampleRate": 16000,
+        "channelCount": 1
+    }
+}
+
+_TROUBLESHOOTING_MD = """
+### 📱 **Mobile Devices (iOS/Android)**
+- **Chrome/Safari**: Fully supported with camera + microphone
+- **Permissions**: Tap "Allow" when prompted for camera/mic access
+- **Performance**: Works best on newer devices (2019+)
+- **Network**: Requires stable internet connection
+
+### 🖥️ **Desktop/Laptop**
+- **Chrome/Edge**: Best performance and compatibility
+- **Firefox**: Supported with minor limitations
+- **Safari**: macOS - fully supported
+- **Permissions**: Check browser settings if camera/mic blocked
+
+### 🔧 **Common Issues**
+- **No Video**: Check camera permissions in browser settings
+- **No Audio**: Check microphone permissions and ensure not muted
+- **Poor Quality**: Try closing other browser tabs or apps
+- **Connection Issues**: Refresh page and try again
+
+### 🌐 **Browser Settings**
+1. Click the 🔒 lock icon in address bar
+2. Allow Camera and Microphone access
+3. Refresh the page if needed
+
+### 📊 **System Requirements**
+- **Internet**: 2+ Mbps upload speed recommended
+- **RAM**: 4GB+ recommended for smooth operation
+- **Browser**: Latest version of Chrome, Edge, Safari, or Firefox
+"""
+
+# Speaker label per transcript entry type; other types aren't shown
+_ENTRY_SPEAKERS = {
+    'ai': "🤖 **AI**",
+    'user': "👤 **You**",
+    'ai_audio': "🔊 **AI**",
+}
+
+# Horizontal rule between entries inside one markdown block
+_ENTRY_SEPARATOR = "\n\n---\n\n"
+
+@st.fragment(run_every=0.1)
+def _draw_transcript(poll_transcript):
+    """
+    Renders the conversation on its own refresh cycle so new entries
+    show up without rerunning the whole page (and the WebRTC component).
+    """
+    transcript = poll_transcript()
+    
+    # Lives in the fragment so its state follows the drained transcript
+    st.button("🗑️ Clear Transcript", use_container_width=True, disabled=not transcript, key="clear_btn",
+              on_click=transcript.clear)
+    
+    if transcript:
+        entries = list(transcript)[-10:]  # Show last 10 entries
+        entries.reverse()
+        
+        # Create scrollable transcript container
+        with st.container():
+            # Runs of plain entries go out as one markdown element
+            parts = []
+            for entry in entries:
+                entry_type = entry.get('type')
+                if entry_type == 'error':
+                    if parts:
+                        st.markdown(_ENTRY_SEPARATOR.join(parts))
+                        parts = []
+                    st.error(f"❌ {entry['content']}")
+                    continue
+                
+                speaker = _ENTRY_SPEAKERS.get(entry_type)
+                if speaker:
+                    parts.append(f"{speaker}: {entry['content']}")
+            
+            if parts:
+                st.markdown(_ENTRY_SEPARATOR.join(parts))
+    else:
+        st.markdown("💬 *Conversation will appear here...*")
+
+
 def draw_interface(
     start_session_callback,
     stop_session_callback,
     video_frame_callback,
     audio_frame_callback,
     is_running,
-    transcript
+    poll_transcript
 ):
     """
     Draws the entire Streamlit UI with universal device support.
     Works on desktop, laptop, and mobile devices.
     """
-    st.set_page_config(
-        page_title="Gemini 2.0 Live Assistant",
-        page_icon="🤖",
-        layout="wide",
-        initial_sidebar_state="collapsed"
-    )
-    
     st.title("🤖 Gemini 2.0 Live Assistant")
     st.caption("Real-time multimodal AI powered by Google Gemini 2.0")
 
-    # ✅ Initialize stable component key once per session
-    if 'webrtc_component_key' not in st.session_state:
-        st.session_state.webrtc_component_key = f"gemini-live-{uuid.uuid4().hex[:8]}"
-
-    # ✅ Initialize transcript if not passed
-    if 'transcript' not in st.session_state:
-        st.session_state.transcript = []
-
     # Main layout
     col1, col2 = st.columns([0.6, 0.4])
 
     with col1:
         st.subheader("📹 Live Camera Feed")
         
-        # ✅ Universal WebRTC configuration for ALL devices
         try:
             webrtc_ctx = webrtc_streamer(
                 key=st.session_state.webrtc_component_key,
                 mode=WebRtcMode.SENDRECV,
-                rtc_configuration={
-                    "iceServers": [
-                        {"urls": ["stun:stun.l.google.com:19302"]},
-                        {"urls": ["stun:stun1.l.google.com:19302"]},
-                        {"urls": ["stun:stun.stunprotocol.org:3478"]},
-                    ]
-                },
-                media_stream_constraints={
-                    "video": {
-                        "width": {"min": 320, "ideal": 640, "max": 1280},
-                        "height": {"min": 240, "ideal": 480, "max": 720},
-                        "frameRate": {"min": 10, "ideal": 15, "max": 30},
-                        "facingMode": "user"  # Front camera for mobile
-                    },
-                    "audio": {
-                        "echoCancellation": True,
-                        "noiseSuppression": True,
-                        "autoGainControl": True,
-                        "sampleRate": 16000,
-                        "channelCount": 1
-                    }
-                },
+                rtc_configuration=_RTC_CONFIG,
+                media_stream_constraints=_MEDIA_CONSTRAINTS,
                 video_frame_callback=video_frame_callback,
                 audio_frame_callback=audio_frame_callback,
                 async_processing=True,
@@ -79,20 +148,13 @@ def draw_interface(
     with col2:
         st.subheader("🎛️ Controls & Transcript")
         
-        # Control buttons
+        # Control buttons (on_click runs before the rerun, so no st.rerun())
         if not is_running:
-            if st.button("🚀 Start Live Session", type="primary", use_container_width=True, key="start_btn"):
-                start_session_callback()
-                st.rerun()
+            st.button("🚀 Start Live Session", type="primary", use_container_width=True, key="start_btn",
+                      on_click=start_session_callback)
         else:
-            if st.button("⏹️ Stop Session", type="secondary", use_container_width=True, key="stop_btn"):
-                stop_session_callback()
-                st.rerun()
-        
-        # Clear transcript
-        if st.button("🗑️ Clear Transcript", use_container_width=True, disabled=not transcript, key="clear_btn"):
-            st.session_state.transcript = []
-            st.rerun()
+            st.button("⏹️ Stop Session", type="secondary", use_container_width=True, key="stop_btn",
+                      on_click=stop_session_callback)
         
         st.markdown("---")
         
@@ -108,55 +170,11 @@ def draw_interface(
         # Transcript display
         st.markdown("**Conversation:**")
         
-        if transcript:
-            # Create scrollable transcript container
-            with st.container():
-                for i, entry in enumerate(reversed(transcript[-10:])):  # Show last 10 entries
-                    if entry.get('type') == 'ai':
-                        st.markdown(f"🤖 **AI**: {entry['content']}")
-                    elif entry.get('type') == 'user':
-                        st.markdown(f"👤 **You**: {entry['content']}")
-                    elif entry.get('type') == 'ai_audio':
-                        st.markdown(f"🔊 **AI**: {entry['content']}")
-                    elif entry.get('type') == 'error':
-                        st.error(f"❌ {entry['content']}")
-                    
-                    if i < len(transcript[-10:]) - 1:
-                        st.markdown("---")
-        else:
-            st.markdown("💬 *Conversation will appear here...*")
+        _draw_transcript(poll_transcript)
     
     # Mobile-friendly troubleshooting
     with st.expander("🔧 Device Support & Troubleshooting"):
-        st.markdown("""
-        ### 📱 **Mobile Devices (iOS/Android)**
-        - **Chrome/Safari**: Fully supported with camera + microphone
-        - **Permissions**: Tap "Allow" when prompted for camera/mic access
-        - **Performance**: Works best on newer devices (2019+)
-        - **Network**: Requires stable internet connection
-        
-        ### 🖥️ **Desktop/Laptop**
-        - **Chrome/Edge**: Best performance and compatibility
-        - **Firefox**: Supported with minor limitations
-        - **Safari**: macOS - fully supported
-        - **Permissions**: Check browser settings if camera/mic blocked
-        
-        ### 🔧 **Common Issues**
-        - **No Video**: Check camera permissions in browser settings
-        - **No Audio**: Check microphone permissions and ensure not muted
-        - **Poor Quality**: Try closing other browser tabs or apps
-        - **Connection Issues**: Refresh page and try again
-        
-        ### 🌐 **Browser Settings**
-        1. Click the 🔒 lock icon in address bar
-        2. Allow Camera and Microphone access
-        3. Refresh the page if needed
-        
-        ### 📊 **System Requirements**
-        - **Internet**: 2+ Mbps upload speed recommended
-        - **RAM**: 4GB+ recommended for smooth operation
-        - **Browser**: Latest version of Chrome, Edge, Safari, or Firefox
-        """)
+        st.markdown(_TROUBLESHOOTING_MD)
     
     # Footer
     st.markdown("---")